@@ -1,18 +1,30 @@
+from collections import namedtuple
 from functools import partial
 
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 from matplotlib.animation import FuncAnimation
-from numpy import ndarray
+from matplotlib.collections import LineCollection
 
+from stravaplot.plot import calc_bounds
 
-def init_artists(fig, xlim, ylim, n_tracks):
+# Offsets for an empty scatter plot, shared rather than allocated per frame.
+# Double precision, as set_offsets would otherwise convert it on each call
+_EMPTY_OFFSETS = np.empty((0, 2))
+
+# A track's points aligned to the animation's time indices: mask flags the
+# frames where the track has a point, count is the number of points drawn
+# through each frame, and xy holds the track's (lon, lat) points in frame order
+AlignedTrack = namedtuple('AlignedTrack', ['mask', 'count', 'xy'])
+
+
+def init_artists(fig, xlim, ylim):
     """
     Initialize matplotlib artists for composing the animation.
     :param fig: matplotlib Figure
     :param xlim: xlim tuple for matplotlib Axes
     :param ylim: ylim tuple for matplotlib Axes
-    :param n_tracks: number of tracks to be animated
     :return: list of artists: (timestamp, "leader" dot, track histories)
     """
     ax = plt.axes(xlim=xlim, ylim=ylim)
@@ -32,11 +44,10 @@ def init_artists(fig, xlim, ylim, n_tracks):
             fontsize=15,
         ),
         ax.scatter([], [], color='red', s=40, zorder=4, animated=True),
+        ax.add_collection(
+            LineCollection([], colors='deepskyblue', linewidths=0.5, alpha=0.7, animated=True)
+        ),
     ]
-    for _ in range(n_tracks):
-        artists.append(
-            ax.plot([], [], color='deepskyblue', lw=0.5, alpha=0.7, animated=True)[0]
-        )
     return artists
 
 
@@ -46,11 +57,10 @@ def init_frame(artists):
     :param artists: list of artists
     :return: list of artists with initial frame data set
     """
-    time_artist, head_artist, *track_artists = artists
+    time_artist, head_artist, track_artist = artists
     time_artist.set_text('')
-    head_artist.set_offsets(ndarray(shape=(0, 2)))
-    for artist in track_artists:
-        artist.set_data([], [])
+    head_artist.set_offsets(_EMPTY_OFFSETS)
+    track_artist.set_segments([])
     return artists
 
 
@@ -59,58 +69,60 @@ def gen_time_indices(all_tracks, step_interval):
     Generate time indices for animation, spanning from the earliest track's
     start to the last tracks's end, in the specified step interval (e.g.,
     '15S' for 15 second increments).
-    :param all_tracks: list of tracks
+    :param all_tracks: list of tracks, indexed by seconds since midnight
     :param step_interval: step interval for generated timestamps
-    :return: list of timestamps ('HH:MM:SS' format)
+    :return: array of timestamps (seconds since midnight)
     """
     start = min([r.index.min() for r in all_tracks])
     end = max([r.index.max() for r in all_tracks])
-    # Make some fake dates to get pandas to generate a time range, then strip date component
-    dt_range = pd.date_range(
-        start='2000/01/01T{}'.format(start),
-        end='2000/01/01T{}'.format(end),
-        freq=step_interval,
-    )
-    return [dt.strftime('%H:%M:%S') for dt in dt_range]
+    step = int(pd.Timedelta(step_interval).total_seconds())
+    return np.arange(start, end + 1, step)
 
 
-def get_point(track, time_idx):
+def align_track(track, indices):
     """
-    Get GPX track point from a track for a given time index.
+    Align a track's points to the animation's time indices, so that each
+    frame can look up its point by position rather than by label.
     :param track: track DataFrame
-    :param time_idx: time index
-    :return: GPX track point for time index, or None if no point exists at
-    that time
+    :param indices: array of time indices for the animation
+    :return: AlignedTrack for the given indices
     """
-    try:
-        return track.loc[time_idx]
-    except KeyError:
-        return None
+    track = track[~track.index.duplicated()]
+    positions = track.index.get_indexer(indices)
+    mask = positions >= 0
+    return AlignedTrack(
+        mask=mask,
+        count=np.cumsum(mask),
+        # matplotlib paths are double precision; convert once rather than per draw
+        xy=track[['lon', 'lat']].to_numpy(dtype=np.float64)[positions[mask]],
+    )
 
 
-def update_artists(artists, tracks, time_idx):
+def update_artists(artists, tracks, presence, labels, heads, frame):
     """
-    Update all artists for the given time index.
+    Update all artists for the given frame.
     :param artists: list of artists
-    :param tracks: list of tracks
-    :param time_idx: time index for artists to draw
+    :param tracks: list of AlignedTracks
+    :param presence: (n_frames, n_tracks) bool array flagging the tracks with
+    a point in each frame
+    :param labels: list of 'HH:MM' timestamp labels, one per frame
+    :param heads: (n_tracks, 2) buffer for the frame's "leader" dot offsets
+    :param frame: frame number (position in indices) for artists to draw
     :return: list of artists
     """
-    time_artist, head_artist, *track_artists = artists
-    time_artist.set_text(time_idx[:5])
-    head_lonlat = []
-    for artist, track in zip(track_artists, tracks):
-        point = get_point(track, time_idx)
-        if point is not None:
-            lon, lat = artist.get_data()
-            lon.append(point['lon'])
-            lat.append(point['lat'])
-            artist.set_data(lon, lat)
-            head_lonlat.append((point['lon'], point['lat']))
-    if head_lonlat:
-        head_artist.set_offsets(head_lonlat)
-    else:
-        head_artist.set_offsets(ndarray(shape=(0, 2)))  # empty scatter plot
+    time_artist, head_artist, track_artist = artists
+    time_artist.set_text(labels[frame])
+    active = np.flatnonzero(presence[frame])
+    if len(active):
+        # Histories only grow in frames where some track has a point
+        track_artist.set_segments([track.xy[:track.count[frame]] for track in tracks])
+        for n_heads, i in enumerate(active):
+            heads[n_heads] = tracks[i].xy[tracks[i].count[frame] - 1]
+        head_artist.set_offsets(heads[:len(active)])
+    elif len(head_artist.get_offsets()):
+        head_artist.set_offsets(_EMPTY_OFFSETS)
+    # All artists share one Axes, and blitting restores that Axes' whole
+    # background before drawing, so unchanged artists must still be returned
     return artists
 
 
@@ -126,19 +138,21 @@ def setup_animation(tracks, step_interval):
     xlim, ylim = calc_bounds(tracks)
     indices = gen_time_indices(tracks, step_interval)
     fig = plt.figure(figsize=(5, 12))
-    artists = init_artists(fig, xlim, ylim, len(tracks))
+    artists = init_artists(fig, xlim, ylim)
     init = partial(init_frame, artists)
-    def frames(): return indices
-    update = partial(update_artists, artists, tracks)
+    aligned = [align_track(track, indices) for track in tracks]
+    presence = np.column_stack([track.mask for track in aligned])
+    labels = [f'{seconds // 3600:02d}:{seconds // 60 % 60:02d}' for seconds in indices.tolist()]
+    heads = np.empty((len(tracks), 2))
+    update = partial(update_artists, artists, aligned, presence, labels, heads)
 
     ani = FuncAnimation(
         fig,
         update,
-        frames=frames,
+        frames=range(len(indices)),
         init_func=init,
         blit=True,
         interval=15,
         repeat=False,
-        save_count=len(indices),
     )
     return ani
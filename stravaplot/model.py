@@ -1,17 +1,36 @@
-import csv
 import datetime
 import gzip
+import hashlib
+import io
+import os
+import tempfile
+import xml.etree.ElementTree as ElementTree
 from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
+from typing import Callable
 from typing import IO
 from typing import Optional
 from typing import Tuple
 from typing import Union
 
 import fitparse
-import gpxpy
+import numpy as np
 import pandas as pd
-from geopy import distance
+
+try:
+    # ISA-L's inflate is a drop-in, faster replacement for the gzip module
+    from isal import igzip as gzip_module
+except ImportError:
+    gzip_module = gzip
+
+# Mean Earth radius, for great-circle (haversine) distances
+EARTH_RADIUS_MI = 3958.7613
+
+# Read buffer for activity files, large enough to hold most files whole so
+# the parsers' many small reads don't each go back to the file or inflater
+READ_BUFFER_SIZE = 1 << 20
 
 
 def load_activities_metadata(data_dir: str, activity_type: Optional[str] = None) -> pd.DataFrame:
@@ -23,14 +42,14 @@ def load_activities_metadata(data_dir: str, activity_type: Optional[str] = None)
     activity type (e.g., 'Ride'), or set to None to load all activities
     :return: metadata DataFrame
     """
-
-    def type_filter(d):
-        return d['Activity Type'].lower() == activity_type.lower() if activity_type else True
-
-    activities_csv = Path(data_dir) / 'activities.csv'
-    with activities_csv.open() as f:
-        reader = csv.DictReader(f)
-        activities_meta = pd.DataFrame([d for d in reader if type_filter(d)])
+    # Few distinct activity types, so matching runs once per type, not per row
+    activities_meta = pd.read_csv(Path(data_dir) / 'activities.csv', dtype={'Activity Type': 'category'})
+    if activity_type:
+        is_type = activities_meta['Activity Type'].str.lower() == activity_type.lower()
+        activities_meta = activities_meta[is_type].reset_index(drop=True)
+        # Drop the filtered-out types, so they don't show up as empty groups
+        activities_meta['Activity Type'] = activities_meta['Activity Type'].cat.remove_unused_categories()
+    # Parsed after filtering (not via parse_dates), so only kept rows pay for it
     activities_meta['Activity Date'] = pd.to_datetime(activities_meta['Activity Date'])
     return activities_meta
 
@@ -41,12 +60,34 @@ def load_gpx(gpx_file: IO) -> pd.DataFrame:
     :param gpx_file: GPX file object
     :return: DataFrame object with GPX track points
     """
-    gpx = gpxpy.parse(gpx_file)
-    data = [
-        {'lat': p.latitude, 'lon': p.longitude, 'alt': p.elevation, 'ts': p.time}
-        for p in gpx.tracks[0].segments[0].points
-    ]
-    gpx_df = pd.DataFrame(data=data).set_index('ts')
+    lats, lons, alts, times = [], [], [], []
+    # Stream over the first track segment's points, clearing each one once read
+    for _, elem in ElementTree.iterparse(gpx_file):
+        tag = elem.tag.rpartition('}')[2]
+        if tag == 'trkpt':
+            lats.append(elem.get('lat'))
+            lons.append(elem.get('lon'))
+            alt = ts = None
+            for child in elem:
+                child_tag = child.tag.rpartition('}')[2]
+                if child_tag == 'ele':
+                    alt = child.text
+                elif child_tag == 'time':
+                    ts = child.text
+            alts.append(alt)
+            times.append(ts)
+            elem.clear()
+        elif tag == 'trkseg':
+            break
+    # Single precision is ~1m at GPS coordinates, more than a GPS fix resolves
+    gpx_df = pd.DataFrame(
+        data={
+            'lat': np.array(lats, dtype=np.float32),
+            'lon': np.array(lons, dtype=np.float32),
+            'alt': np.array(alts, dtype=np.float32),
+        },
+        index=pd.DatetimeIndex(pd.to_datetime(times, utc=True), name='ts'),
+    )
     return gpx_df
 
 
@@ -64,52 +105,184 @@ def load_fit(fit_file: IO) -> pd.DataFrame:
                 hr=d.get('heart_rate')
             ))
         fit_df = pd.DataFrame(data=data, columns=Point._fields).set_index('ts')
+    # Single precision, as for GPX tracks
+    fit_df = fit_df.astype({'lat': np.float32, 'lon': np.float32, 'alt': np.float32})
     return fit_df
 
 
-def load_activities(data_dir: str, activities_meta: pd.DataFrame, resample_freq: Optional[str]) -> pd.DataFrame:
+def resample_nearest(df: pd.DataFrame, freq: str) -> pd.DataFrame:
+    """
+    Resample a time-indexed track to a fixed frequency, taking for each time
+    bin the nearest point no more than one bin away (NaN if there is none).
+    Equivalent to df.resample(freq).nearest(limit=1), computed directly with
+    numpy searchsorted rather than pandas' generic reindexing path.
+    :param df: DataFrame with a sorted DatetimeIndex
+    :param freq: resampling frequency, in pandas-acceptable format (e.g.,
+    '15S' for 15 seconds)
+    :return: resampled DataFrame
+    """
+    if df.empty:
+        return df
+    step_delta = pd.Timedelta(freq)
+    step = step_delta.value
+    # Bins count from midnight of the first point's day, as in pandas
+    first = df.index[0]
+    day = first.normalize()
+    start = day + ((first - day) // step_delta) * step_delta
+    ts = df.index.to_numpy(dtype='datetime64[ns]').view('int64')
+    bins = np.arange(start.value, ts[-1] + 1, step)
+
+    # Candidate points on either side of each bin: the first at or after it
+    # (right) and the last before it (left), each usable if within one bin
+    right = np.searchsorted(ts, bins)
+    left = right - 1
+    right_dist = np.where(right < len(ts), ts[np.minimum(right, len(ts) - 1)] - bins, step + 1)
+    left_dist = np.where(left >= 0, bins - ts[np.maximum(left, 0)], step + 1)
+    # Ties go to the later point, as in pandas
+    use_left = left_dist < right_dist
+    found = np.where(use_left, left_dist, right_dist) <= step
+    nearest = np.clip(np.where(use_left, left, right), 0, len(ts) - 1)
+
+    columns = {}
+    for column, values in df.items():
+        values = values.to_numpy()[nearest]
+        columns[column] = values if found.all() else np.where(found, values, np.nan)
+    index = pd.date_range(start, periods=len(bins), freq=freq, name=df.index.name)
+    return pd.DataFrame(columns, index=index)
+
+
+def open_activity_file(file_path: Path) -> IO[bytes]:
+    """
+    Open an exported activity file for buffered binary reading, decompressing
+    it on the fly if gzipped.
+    :param file_path: path to the activity file
+    :return: binary file object
+    """
+    if file_path.suffix == '.gz':
+        return io.BufferedReader(gzip_module.open(file_path, 'rb'), buffer_size=READ_BUFFER_SIZE)
+    return open(file_path, 'rb', buffering=READ_BUFFER_SIZE)
+
+
+def parse_track(file_path: Path, resample_freq: Optional[str]) -> pd.DataFrame:
+    """
+    Parse a single exported activity file (GPX or FIT, optionally gzipped) as
+    a track DataFrame, resampled to the given frequency.
+    :param file_path: path to the activity file
+    :param resample_freq: frequency for resampling the track, in pandas-acceptable
+    format (e.g., '15S' for 15 seconds), or None to skip resampling
+    :return: track DataFrame
+    """
+    suffixes = file_path.suffixes
+    load: Callable[[IO], pd.DataFrame]
+    if '.gpx' in suffixes:
+        load = load_gpx
+    elif '.fit' in suffixes:
+        load = load_fit
+    else:
+        raise ValueError(f'unknown file type: {file_path}')
+    with open_activity_file(file_path) as f:
+        df = load(f)
+
+    # Strip any points with unknown lat/lon
+    df = df[~(df['lat'].isna() | df['lon'].isna())]
+
+    if resample_freq:
+        # Resample the timeseries to reduce number of animated frames
+        df = resample_nearest(df, resample_freq)
+    return df
+
+
+def track_cache_path(file_path: Path, resample_freq: Optional[str], cache_dir: Path) -> Path:
+    """
+    Get the cache file for an activity file's parsed track. The key includes a
+    hash of the file's full path, so data directories can share a cache.
+    :param file_path: path to the activity file
+    :param resample_freq: frequency the track is resampled to, or None
+    :param cache_dir: directory for cached tracks
+    :return: path of the cached track
+    """
+    path_hash = hashlib.sha1(str(file_path.resolve()).encode()).hexdigest()[:16]
+    return cache_dir / f'{file_path.name}.{path_hash}.{resample_freq or "raw"}.pkl'
+
+
+def load_track(
+        file_path: Path,
+        resample_freq: Optional[str],
+        cache_dir: Optional[Path] = None
+) -> Optional[pd.DataFrame]:
+    """
+    Load a single exported activity file as a track DataFrame, resampled to the
+    given frequency. With a cache directory, the parsed track is reused from
+    there as long as the cached copy is newer than the activity file.
+    :param file_path: path to the activity file
+    :param resample_freq: frequency for resampling the track, in pandas-acceptable
+    format (e.g., '15S' for 15 seconds), or None to skip resampling
+    :param cache_dir: directory for cached tracks, or None to always parse
+    :return: track DataFrame, or None if the file does not exist
+    """
+    if not file_path.is_file():
+        return None
+    if cache_dir is None:
+        return parse_track(file_path, resample_freq)
+
+    cache_path = track_cache_path(file_path, resample_freq, cache_dir)
+    if cache_path.is_file() and cache_path.stat().st_mtime >= file_path.stat().st_mtime:
+        try:
+            return pd.read_pickle(cache_path)
+        except Exception:
+            # An unreadable cached track (e.g., from another pandas version)
+            # is a cache miss, and gets replaced below
+            pass
+    df = parse_track(file_path, resample_freq)
+    # Write to a temporary file and move it into place, so an interrupted
+    # write never leaves a truncated cache file behind
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    os.close(fd)
+    try:
+        df.to_pickle(tmp_path)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return df
+
+
+def load_activities(
+        data_dir: str,
+        activities_meta: pd.DataFrame,
+        resample_freq: Optional[str],
+        cache_dir: Optional[str] = None
+) -> pd.DataFrame:
     """
     Load all Strava activities of the given type, resampled to the given frequency.
+    Activity files are parsed in parallel, one process per CPU.
     :param data_dir: directory with strava exported data
     :param activities_meta: activity metadata DataFrame
     :param resample_freq: frequency for resampling GPX tracks, in pandas-acceptable
     format (e.g., '15S' for 15 seconds)
-    :return: activity meta DataFrame with track DataFrame embedded
-    """
-    # TODO clean all this up; don't modify in place
-    tracks = []
-    for _, activity in activities_meta.iterrows():
-        file_path = Path(data_dir) / activity['Filename']
-
-        if file_path.is_file():
-            suffixes = file_path.suffixes
-            if '.gpx' in suffixes:
-                if suffixes[-1] == '.gz':
-                    with gzip.open(file_path) as f:
-                        df = load_gpx(f)
-                else:
-                    with open(file_path) as f:
-                        df = load_gpx(f)
-            elif '.fit' in suffixes:
-                if suffixes[-1] == '.gz':
-                    with gzip.open(file_path) as f:
-                        df = load_fit(f)
-                else:
-                    with open(file_path) as f:
-                        df = load_fit(f)
-            else:
-                raise ValueError(f'unknown file type: {file_path}')
-
-            # Strip any points with unknown lat/lon
-            df = df[~(df['lat'].isna() | df['lon'].isna())]
-
-            if resample_freq:
-                # Resample the timeseries to reduce number of animated frames
-                df = df.resample(resample_freq).nearest(limit=1)
-            tracks.append(df)
-
-    activities_meta['track'] = tracks
-    return activities_meta
+    :param cache_dir: directory for caching parsed tracks between runs (created
+    if missing), or None to parse every file
+    :return: activity meta DataFrame with track DataFrame embedded, limited to
+    activities whose file exists
+    """
+    # Manually entered activities have no file
+    filenames = activities_meta['Filename'].fillna('')
+    file_paths = [Path(data_dir) / filename for filename in filenames]
+    # Hand out files in batches, so each small file doesn't cost a round trip
+    # to a worker, while leaving a few batches per worker to balance the load
+    chunksize = max(1, len(file_paths) // (4 * (os.cpu_count() or 1)))
+    track_cache_dir = Path(cache_dir) if cache_dir is not None else None
+    if track_cache_dir is not None:
+        track_cache_dir.mkdir(parents=True, exist_ok=True)
+    with ProcessPoolExecutor() as executor:
+        tracks = list(executor.map(
+            load_track, file_paths, repeat(resample_freq), repeat(track_cache_dir), chunksize=chunksize
+        ))
+
+    # Shallow copy: only the new track column is added, metadata is shared
+    activities = activities_meta.copy(deep=False)
+    activities['track'] = tracks
+    return activities[activities['track'].notna()]
 
 
 def normalize_timestamps(
@@ -117,20 +290,51 @@ def normalize_timestamps(
         timezone: Union[str, datetime.tzinfo] = 'America/New_York'
 ) -> pd.DataFrame:
     """
-    Convert timestamps to the given timezone and reformat as 'HH:MM:SS'.
+    Convert timestamps to the given timezone and replace them with integer
+    seconds since (local) midnight, so activities from different days share
+    one time axis.
     :param activities: activities DataFrame
     :param timezone: target timezone for all activities' timestamps
     :return: list of activities with normalized timestamps (in-place updates)
     """
-    for _, activity in activities.iterrows():
-        df = activity['track']
-        # Convert activity's timestamp index to local timezone
-        df.index = df.index.tz_convert(timezone)
-        # Reformat timestamps to strip date
-        df.index = df.index.strftime('%H:%M:%S')
+    tracks = activities['track']
+    if tracks.empty:
+        return activities
+    # Convert all activities' timestamps to local wall-clock time at once,
+    # rather than one timezone conversion per activity
+    utc = pd.to_datetime(
+        np.concatenate([track.index.to_numpy(dtype='datetime64[ns]') for track in tracks]), utc=True
+    )
+    local = utc.tz_convert(timezone).tz_localize(None)
+    # Strip date, keeping the time of day in seconds
+    seconds = local.to_numpy(dtype='datetime64[s]').view('int64') % 86400
+    splits = np.cumsum([len(track) for track in tracks])[:-1]
+    for track, track_seconds in zip(tracks, np.split(seconds, splits)):
+        track.index = pd.Index(track_seconds)
     return activities
 
 
+def haversine_miles(
+        lat1: Union[float, np.ndarray],
+        lon1: Union[float, np.ndarray],
+        lat2: Union[float, np.ndarray],
+        lon2: Union[float, np.ndarray]
+) -> Union[float, np.ndarray]:
+    """
+    Calculate great-circle (haversine) distances between points, in miles.
+    Arguments are in degrees and broadcast against each other, so one call
+    can compare many points to a single target or pairs of point arrays.
+    :param lat1: latitude(s) of the first point(s)
+    :param lon1: longitude(s) of the first point(s)
+    :param lat2: latitude(s) of the second point(s)
+    :param lon2: longitude(s) of the second point(s)
+    :return: distance(s) in miles
+    """
+    lat1, lon1, lat2, lon2 = np.radians(lat1), np.radians(lon1), np.radians(lat2), np.radians(lon2)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MI * np.arcsin(np.sqrt(a))
+
+
 def filter_activities_by_origin(activities: pd.DataFrame, target: Tuple[float, float], distance_mi: float) -> pd.Series:
     """
     Generator for filtering activities by the lat/lon of the first tracked
@@ -140,8 +344,9 @@ def filter_activities_by_origin(activities: pd.DataFrame, target: Tuple[float, f
     :param distance_mi: origin filter distance in miles
     :return: filtered activities
     """
-    for _, activity in activities.iterrows():
-        start_pt = activity['track'].iloc[0]
-        origin = (start_pt['lat'], start_pt['lon'])
-        if distance.distance(origin, target).miles < distance_mi:
-            yield activity
+    tracks = activities['track']
+    lats = np.fromiter((track['lat'].iat[0] for track in tracks), float, count=len(tracks))
+    lons = np.fromiter((track['lon'].iat[0] for track in tracks), float, count=len(tracks))
+    distances = haversine_miles(lats, lons, target[0], target[1])
+    for i in np.flatnonzero(distances < distance_mi):
+        yield activities.iloc[i]
@@ -1,10 +1,15 @@
+from typing import Any
 from typing import Collection
+from typing import Dict
 from typing import Iterable
+from typing import Optional
 from typing import Tuple
 
+import matplotlib.collections as mcollections
 import matplotlib.patches as mpatches
 import matplotlib.path as mpath
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 
 
@@ -22,17 +27,62 @@ def calc_bounds(
     :param lon_pad: amount to pad longitude boundaries
     :return: (xlim, ylim) tuple appropriate for matplotlib
     """
-    min_lat = min([act['lat'].min() for act in tracks])
-    min_lon = min([act['lon'].min() for act in tracks])
-    max_lat = max([act['lat'].max() for act in tracks])
-    max_lon = max([act['lon'].max() for act in tracks])
+    min_lat = min_lon = np.inf
+    max_lat = max_lon = -np.inf
+    # One pass over the tracks, without stacking their coordinates; fmin/fmax
+    # reductions skip NaN points, as Series.min/max did
+    for act in tracks:
+        if act.empty:
+            continue
+        lats, lons = act['lat'].to_numpy(), act['lon'].to_numpy()
+        min_lat, max_lat = min(min_lat, np.fmin.reduce(lats)), max(max_lat, np.fmax.reduce(lats))
+        min_lon, max_lon = min(min_lon, np.fmin.reduce(lons)), max(max_lon, np.fmax.reduce(lons))
     xlim = (min_lon - lon_pad, max_lon + lon_pad)
     ylim = (min_lat - lat_pad, max_lat + lat_pad)
     return xlim, ylim
 
 
-def draw_track(track: pd.DataFrame, ax: plt.Axes, **kwargs) -> plt.Axes:
-    """ Draw a single track on an Axes. """
+def rdp(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """ Simplify a polyline of (n, 2) points with Ramer-Douglas-Peucker. """
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        chord = points[end] - points[start]
+        offsets = points[start + 1:end] - points[start]
+        chord_len = np.hypot(*chord)
+        if chord_len:
+            dists = np.abs(chord[0] * offsets[:, 1] - chord[1] * offsets[:, 0]) / chord_len
+        else:
+            dists = np.hypot(offsets[:, 0], offsets[:, 1])
+        farthest = int(np.argmax(dists))
+        if dists[farthest] > tolerance:
+            split = start + 1 + farthest
+            keep[split] = True
+            stack.extend([(start, split), (split, end)])
+    return points[keep]
+
+
+def track_vertices(track: pd.DataFrame, simplify_tol: Optional[float] = None) -> np.ndarray:
+    """
+    Get a track's (lon, lat) vertices as an (n, 2) array, optionally simplified
+    with Ramer-Douglas-Peucker to the given tolerance (in degrees). Gaps of
+    unknown points are kept as NaN breaks in the line.
+    """
+    verts = track[['lon', 'lat']].to_numpy(dtype=float)
+    if not simplify_tol or len(verts) < 3:
+        return verts
+    finite = np.isfinite(verts).all(axis=1)
+    splits = np.flatnonzero(np.diff(finite)) + 1
+    runs = zip(np.split(verts, splits), np.split(finite, splits))
+    return np.concatenate([rdp(run, simplify_tol) if run_finite[0] else run[:1] for run, run_finite in runs])
+
+
+def draw_track(track: pd.DataFrame, ax: plt.Axes, simplify_tol: Optional[float] = None, **kwargs) -> plt.Axes:
+    """ Draw a single track on an Axes, optionally simplified to a tolerance in degrees. """
     patch_args = {
         'facecolor': 'None',
         'edgecolor': 'black',
@@ -40,22 +90,27 @@ def draw_track(track: pd.DataFrame, ax: plt.Axes, **kwargs) -> plt.Axes:
     }
     patch_args.update(kwargs)
 
-    verts = [(pt.lon, pt.lat) for pt in track.itertuples()]
-    codes = [mpath.Path.MOVETO] + [mpath.Path.LINETO] * (len(verts) - 1)
-    path = mpath.Path(verts, codes)
+    # Without codes, a Path is drawn as MOVETO followed by LINETOs
+    path = mpath.Path(track_vertices(track, simplify_tol))
     patch = mpatches.PathPatch(path, **patch_args)
     ax.add_patch(patch)
     return ax
 
 
-def draw_composite(tracks: Iterable[pd.DataFrame], ax: plt.Axes, **kwargs) -> plt.Axes:
-    """ Draw multiple tracks on an Axes. """
-    patch_args = {
+def draw_composite(
+        tracks: Iterable[pd.DataFrame],
+        ax: plt.Axes,
+        simplify_tol: Optional[float] = None,
+        **kwargs
+) -> plt.Axes:
+    """ Draw multiple tracks on an Axes, as a single collection, optionally simplified to a tolerance in degrees. """
+    collection_args: Dict[str, Any] = {
+        'edgecolor': 'black',
         'lw': 0.5,
         'alpha': 0.7
     }
-    patch_args.update(kwargs)
+    collection_args.update(kwargs)
 
-    for track in tracks:
-        ax = draw_track(track, ax, **patch_args)
+    segments = [track_vertices(track, simplify_tol) for track in tracks]
+    ax.add_collection(mcollections.LineCollection(segments, **collection_args))
     return ax
@@ -1,13 +1,22 @@
 from itertools import tee
+from typing import AnyStr
 from typing import Iterable
 from typing import Iterator
-from typing import List
 from typing import Set
 from typing import Tuple
+from typing import Union
 
 import mmh3
+import numpy as np
 import pandas as pd
-import pygeohash
+from numpy.lib.stride_tricks import as_strided
+
+# Modulus for the universal hash family behind minhash permutations: the
+# smallest prime above 2**32, so it exceeds every 32-bit mmh3 hash
+HASH_PRIME = 4294967311
+
+# Geohash base32 alphabet, indexed by 5-bit code
+GEOHASH_ALPHABET = np.frombuffer(b'0123456789bcdefghjkmnpqrstuvwxyz', dtype='S1')
 
 
 def window(iterable: Iterable, size: int) -> Iterator[Tuple]:
@@ -19,33 +28,116 @@ def window(iterable: Iterable, size: int) -> Iterator[Tuple]:
     return zip(*iters)
 
 
-def common_prefix_len(a: str, b: str) -> int:
-    """ Find the common prefix of two strings. """
+def window_array(values: np.ndarray, size: int) -> np.ndarray:
+    """ Create a read-only (n - size + 1, size) view of moving windows over a 1-D array, without copying. """
+    n_windows = max(len(values) - size + 1, 0)
+    stride = values.strides[0]
+    return as_strided(values, shape=(n_windows, size), strides=(stride, stride), writeable=False)
+
+
+def common_prefix_len(a: AnyStr, b: AnyStr) -> int:
+    """ Find the common prefix of two strings, or of two bytes strings. """
+    if a == b:
+        return len(a)
     min_len = min(len(a), len(b))
-    for i in range(min(len(a), len(b))):
-        if a[i] != b[i]:
-            return i
-    return min_len
+    if isinstance(a, bytes) and isinstance(b, bytes):
+        a_bytes, b_bytes = a[:min_len], b[:min_len]
+    else:
+        try:
+            a_bytes, b_bytes = a[:min_len].encode('ascii'), b[:min_len].encode('ascii')
+        except UnicodeEncodeError:
+            for i in range(min_len):
+                if a[i] != b[i]:
+                    return i
+            return min_len
+    # Compare as big-endian integers: the highest differing bit falls in the
+    # first differing byte, so the bytes above it are the common prefix
+    diff = int.from_bytes(a_bytes, 'big') ^ int.from_bytes(b_bytes, 'big')
+    return min_len - (diff.bit_length() + 7) // 8
+
+
+def common_prefix_len_matrix(codes: np.ndarray) -> np.ndarray:
+    """ Find the common prefix length of every pair of fixed-width bytes codes (e.g., geohashes). """
+    chars = np.ascontiguousarray(codes).view(np.uint8).reshape(len(codes), codes.itemsize)
+    # Count each pair's leading run of matching characters
+    matches = chars[:, np.newaxis, :] == chars[np.newaxis, :, :]
+    prefix_lens = np.logical_and.accumulate(matches, axis=2).sum(axis=2)
+    # Shorter codes are NUL-padded to the array's width, and padding in both
+    # codes of a pair matches, so cap each count at the shorter code's length
+    lengths = np.char.str_len(codes)
+    return np.minimum(prefix_lens, np.minimum.outer(lengths, lengths))
 
 
 # TODO try more shingling approaches
-def make_shingles(raw: pd.Series, size: int) -> Set:
-    """ Create shingles from the raw data. """
+def make_shingles(raw: pd.Series, size: int) -> Set[bytes]:
+    """ Create shingles from fixed-length codes (e.g., geohashes), each packed into one bytes string. """
     no_repeats = raw[raw.shift() != raw]
-    shingles = set([' '.join(group) for group in window(no_repeats, size)])
+    # Codes are all one length, so each window's codes pack without separators
+    # into one fixed-width bytes value, laid out contiguously by the copy
+    codes = no_repeats.to_numpy().astype('S')
+    packed = np.ascontiguousarray(window_array(codes, size)).view(f'S{codes.itemsize * size}')
+    shingles = set(packed.ravel().tolist())
     return shingles
 
 
-def b1_minhash_sig(shingles: Set, components: int = 256) -> List[int]:
+def b1_minhash_sig(shingles: Set[Union[bytes, str]], components: int = 256) -> np.ndarray:
     """ Calculate a 1-bit minhash signature for a set of shingles. """
-    sig = [
-        min([mmh3.hash(shingle, seed, False) for shingle in shingles]) & 1
-        for seed in range(components)
-    ]
+    # Hash each shingle once, then derive one permutation per component from a
+    # fixed universal hash family (a * h + b) mod p, evaluated for all at once.
+    # With a, b and h all below 2**32, a * h fits in 64 bits, and reducing it
+    # before adding b keeps the sum in range too, so nothing overflows
+    hashes = np.fromiter((mmh3.hash(shingle, 0, False) for shingle in shingles), np.uint64, count=len(shingles))
+    rng = np.random.RandomState(0)
+    a = rng.randint(1, 1 << 32, size=components, dtype=np.uint64)
+    b = rng.randint(0, 1 << 32, size=components, dtype=np.uint64)
+    prime = np.uint64(HASH_PRIME)
+    permuted = ((a[:, np.newaxis] * hashes) % prime + b[:, np.newaxis]) % prime
+    sig = (permuted.min(axis=1) & np.uint64(1)).astype(np.uint8)
     return sig
 
 
+def _geohash_cells(coord: np.ndarray, low: float, high: float, n_bits: int) -> np.ndarray:
+    """ Find the cell index of each coordinate in a range split into 2**n_bits cells. """
+    n_cells = 1 << n_bits
+    width = (high - low) / n_cells
+    # Geohash bisection puts points on a boundary in the lower cell, so count
+    # the boundaries strictly below each coordinate; NaNs fall in cell 0
+    cells = np.clip(np.ceil((coord - low) / width) - 1, 0, n_cells - 1)
+    cells[np.isnan(cells)] = 0
+    cells = cells.astype(np.int64)
+    # Cell boundaries are exact in double precision, so nudge any coordinate
+    # that rounding put in a neighbouring cell
+    cells -= (coord <= low + cells * width) & (cells > 0)
+    cells += (coord > low + (cells + 1) * width) & (cells < n_cells - 1)
+    return cells.astype(np.uint64)
+
+
+def _spread_bits(values: np.ndarray) -> np.ndarray:
+    """ Spread the low 32 bits of each value to the even bit positions of a 64 bit value. """
+    for shift, mask in ((16, 0x0000FFFF0000FFFF), (8, 0x00FF00FF00FF00FF), (4, 0x0F0F0F0F0F0F0F0F),
+                        (2, 0x3333333333333333), (1, 0x5555555555555555)):
+        values = (values | (values << np.uint64(shift))) & np.uint64(mask)
+    return values
+
+
+def geohash_codes(track: pd.DataFrame, precision: int) -> np.ndarray:
+    """ Calculate geohash for each point in a track, as an array of fixed-width bytes. """
+    if precision > 12:
+        raise ValueError(f'geohash precision must be at most 12: {precision}')
+    # Geohash bits alternate lon/lat starting from lon, so a geohash is the
+    # interleaving of the points' lon and lat cells at the matching resolutions
+    n_bits = precision * 5
+    lon_cells = _geohash_cells(track['lon'].to_numpy(dtype=float), -180.0, 180.0, (n_bits + 1) // 2)
+    lat_cells = _geohash_cells(track['lat'].to_numpy(dtype=float), -90.0, 90.0, n_bits // 2)
+    lon_shift, lat_shift = np.uint64(1 - n_bits % 2), np.uint64(n_bits % 2)
+    codes = (_spread_bits(lon_cells) << lon_shift) | (_spread_bits(lat_cells) << lat_shift)
+    # Split codes into 5-bit groups, most significant first, and spell them out
+    shifts = np.arange(precision - 1, -1, -1, dtype=np.uint64) * np.uint64(5)
+    chars = GEOHASH_ALPHABET[(codes[:, np.newaxis] >> shifts) & np.uint64(31)]
+    return chars.view(f'S{precision}').ravel()
+
+
 def geohash_track(track: pd.DataFrame, precision: int) -> pd.Series:
     """ Calculate geohash for each point in a track. """
-    geohashes = track.apply(lambda pt: pygeohash.encode(pt['lat'], pt['lon'], precision=precision), axis=1)
-    return geohashes
+    geohashes = geohash_codes(track, precision).astype(str)
+    return pd.Series(geohashes, index=track.index)
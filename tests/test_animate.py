@@ -0,0 +1,68 @@
+from functools import partial
+from unittest.mock import patch
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+import stravaplot.animate as animate
+
+
+def test_gen_time_indices():
+    tracks = [
+        pd.DataFrame({'lat': [0.0, 0.0]}, index=[3600, 3645]),
+        pd.DataFrame({'lat': [0.0, 0.0]}, index=[3630, 3700]),
+    ]
+    actual = animate.gen_time_indices(tracks, '30s')
+    np.testing.assert_array_equal(actual, [3600, 3630, 3660, 3690])
+
+
+def test_align_track():
+    track = pd.DataFrame({'lat': [1.0, 2.0, 3.0], 'lon': [4.0, 5.0, 6.0]}, index=[15, 30, 60])
+    actual = animate.align_track(track, np.array([0, 15, 30, 45, 60]))
+    np.testing.assert_array_equal(actual.mask, [False, True, True, False, True])
+    np.testing.assert_array_equal(actual.count, [0, 1, 2, 2, 3])
+    np.testing.assert_array_equal(actual.xy, [[4.0, 1.0], [5.0, 2.0], [6.0, 3.0]])
+
+
+def test_update_artists():
+    indices = np.array([3600, 3615, 3630, 3645, 3660, 3675, 3690])
+    tracks = [
+        pd.DataFrame({'lat': [1.0, 2.0, 3.0], 'lon': [4.0, 5.0, 6.0]}, index=[3600, 3615, 3630]),
+        pd.DataFrame({'lat': [7.0, 8.0], 'lon': [9.0, 10.0]}, index=[3615, 3660]),
+    ]
+    fig = plt.figure()
+    artists = animate.init_artists(fig, (0, 20), (0, 20))
+    time_artist, head_artist, track_artist = animate.init_frame(artists)
+    aligned = [animate.align_track(track, indices) for track in tracks]
+    presence = np.column_stack([track.mask for track in aligned])
+    labels = [f'label {frame}' for frame in range(len(indices))]
+    heads = np.empty((len(tracks), 2))
+    update = partial(animate.update_artists, artists, aligned, presence, labels, heads)
+
+    # Frames 3, 5 and 6 have no track points
+    expected_heads = [
+        [[4.0, 1.0]],
+        [[5.0, 2.0], [9.0, 7.0]],
+        [[6.0, 3.0]],
+        [],
+        [[10.0, 8.0]],
+        [],
+        [],
+    ]
+    for frame, frame_heads in enumerate(expected_heads):
+        with patch.object(head_artist, 'set_offsets', wraps=head_artist.set_offsets) as set_offsets:
+            assert update(frame) is artists
+        assert time_artist.get_text() == f'label {frame}'
+        assert [len(segment) for segment in track_artist.get_segments()] == [
+            track.count[frame] for track in aligned
+        ]
+        np.testing.assert_array_equal(head_artist.get_offsets(), np.reshape(frame_heads, (-1, 2)))
+        if frame in (3, 5):
+            # The first idle frame after an active one clears the "leader" dots...
+            assert set_offsets.call_count == 1
+            assert set_offsets.call_args[0][0] is animate._EMPTY_OFFSETS
+        elif frame == 6:
+            # ...and a second idle frame leaves them alone
+            set_offsets.assert_not_called()
+    plt.close(fig)
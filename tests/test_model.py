@@ -0,0 +1,163 @@
+import gzip
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import stravaplot.model as model
+
+
+@pytest.mark.parametrize(
+    'lat1,lon1,lat2,lon2,expected',
+    [
+        pytest.param(40.7128, -74.0060, 42.3601, -71.0589, 190.207, id='new york to boston'),
+        pytest.param(40.7128, -74.0060, 40.7128, -74.0060, 0.0, id='same point'),
+        pytest.param(np.array([0.0, 0.0]), np.array([0.0, 90.0]), 0.0, 0.0, [0.0, 6218.4], id='broadcast target'),
+    ]
+)
+def test_haversine_miles(lat1, lon1, lat2, lon2, expected):
+    actual = model.haversine_miles(lat1, lon1, lat2, lon2)
+    assert actual == pytest.approx(expected, abs=0.1)
+
+
+def test_filter_activities_by_origin():
+    starts = [(40.7128, -74.0060), (40.7306, -73.9352), (42.3601, -71.0589)]
+    activities = pd.DataFrame({
+        'name': ['manhattan', 'brooklyn', 'boston'],
+        'track': [pd.DataFrame({'lat': [lat, lat + 0.1], 'lon': [lon, lon + 0.1]}) for lat, lon in starts],
+    })
+    actual = model.filter_activities_by_origin(activities, (40.7128, -74.0060), 5)
+    assert [activity['name'] for activity in actual] == ['manhattan', 'brooklyn']
+
+
+def test_load_gpx():
+    gpx = io.BytesIO(b'''<?xml version="1.0" encoding="UTF-8"?>
+<gpx creator="StravaGPX" version="1.1" xmlns="http://www.topografix.com/GPX/1/1">
+ <metadata><time>2020-06-01T11:59:00Z</time></metadata>
+ <trk>
+  <name>Morning Ride</name>
+  <trkseg>
+   <trkpt lat="40.7128000" lon="-74.0060000"><ele>10.2</ele><time>2020-06-01T12:00:00Z</time></trkpt>
+   <trkpt lat="40.7129000" lon="-74.0061000"><time>2020-06-01T12:00:01Z</time></trkpt>
+  </trkseg>
+  <trkseg>
+   <trkpt lat="41.0000000" lon="-75.0000000"><ele>0.0</ele><time>2020-06-01T13:00:00Z</time></trkpt>
+  </trkseg>
+ </trk>
+</gpx>''')
+    actual = model.load_gpx(gpx)
+    expected = pd.DataFrame(
+        {'lat': [40.7128, 40.7129], 'lon': [-74.006, -74.0061], 'alt': [10.2, np.nan]},
+        index=pd.DatetimeIndex(['2020-06-01T12:00:00Z', '2020-06-01T12:00:01Z'], name='ts'),
+        dtype=np.float32,
+    )
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_load_activities(tmp_path):
+    gpx = '''<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg>
+ <trkpt lat="40.0" lon="-74.0"><time>2020-06-01T12:00:00Z</time></trkpt>
+ <trkpt lat="40.1" lon="-74.1"><time>2020-06-01T12:00:25Z</time></trkpt>
+</trkseg></trk></gpx>'''
+    (tmp_path / 'activities').mkdir()
+    (tmp_path / 'activities' / '1.gpx').write_text(gpx)
+    with gzip.open(tmp_path / 'activities' / '2.gpx.gz', 'wt') as f:
+        f.write(gpx)
+    (tmp_path / 'activities.csv').write_text(
+        'Activity ID,Activity Date,Activity Type,Filename\n'
+        '1,"Jun 1, 2020, 12:00:00 PM",Ride,activities/1.gpx\n'
+        '2,"Jun 2, 2020, 12:00:00 PM",Ride,activities/2.gpx.gz\n'
+        '3,"Jun 3, 2020, 12:00:00 PM",Ride,activities/3.gpx\n'
+        '4,"Jun 4, 2020, 12:00:00 PM",Run,activities/4.gpx\n'
+        '5,"Jun 5, 2020, 12:00:00 PM",Ride,\n'
+    )
+    meta = model.load_activities_metadata(str(tmp_path), 'ride')
+    actual = model.load_activities(str(tmp_path), meta, '10s')
+    assert list(actual['Activity ID'].astype(int)) == [1, 2]
+    assert 'track' not in meta
+    assert meta['Activity Type'].value_counts().to_dict() == {'Ride': 4}
+    for track in actual['track']:
+        assert list(track['lat']) == pytest.approx([40.0, 40.0, 40.1])
+
+    cached = model.load_activities(str(tmp_path), meta, '10s', cache_dir=str(tmp_path / 'cache'))
+    assert sorted(path.name for path in (tmp_path / 'cache').iterdir()) == sorted(
+        model.track_cache_path(tmp_path / filename, '10s', tmp_path / 'cache').name
+        for filename in ['activities/1.gpx', 'activities/2.gpx.gz']
+    )
+    for track, cached_track in zip(actual['track'], cached['track']):
+        pd.testing.assert_frame_equal(cached_track, track)
+
+
+def test_load_track_cache(tmp_path):
+    gpx = '''<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg>
+ <trkpt lat="{lat}" lon="-74.0"><time>2020-06-01T12:00:00Z</time></trkpt>
+</trkseg></trk></gpx>'''
+    file_path = tmp_path / '1.gpx'
+    file_path.write_text(gpx.format(lat=40.0))
+    cache_dir = tmp_path / 'cache'
+    cache_dir.mkdir()
+    cache_path = model.track_cache_path(file_path, '10s', cache_dir)
+    assert list(model.load_track(file_path, '10s', cache_dir)['lat']) == [40.0]
+    assert [path.name for path in cache_dir.iterdir()] == [cache_path.name]
+
+    # Cached track is reused while it is newer than the activity file...
+    file_path.write_text(gpx.format(lat=41.0))
+    os.utime(file_path, (0, 0))
+    assert list(model.load_track(file_path, '10s', cache_dir)['lat']) == [40.0]
+    # ...and the file is parsed again once it changes
+    os.utime(cache_path, (0, 0))
+    os.utime(file_path)
+    assert list(model.load_track(file_path, '10s', cache_dir)['lat']) == [41.0]
+
+    # A truncated cache file is treated as a miss and rewritten
+    cache_path.write_bytes(cache_path.read_bytes()[:20])
+    assert list(model.load_track(file_path, '10s', cache_dir)['lat']) == [41.0]
+    assert list(pd.read_pickle(cache_path)['lat']) == [41.0]
+
+
+def test_track_cache_path_distinguishes_directories(tmp_path):
+    cache_dir = tmp_path / 'cache'
+    first = model.track_cache_path(tmp_path / 'a' / 'activities' / '1.gpx', '10s', cache_dir)
+    second = model.track_cache_path(tmp_path / 'b' / 'activities' / '1.gpx', '10s', cache_dir)
+    assert first != second
+    assert first.parent == second.parent == cache_dir
+
+
+@pytest.mark.parametrize(
+    'offsets,freq',
+    [
+        pytest.param([0, 3, 7, 12, 14, 29, 31, 100, 101, 130], '15s', id='dense with gap'),
+        pytest.param([0, 15, 30, 45], '15s', id='on bin edges'),
+        pytest.param([5, 20, 50, 51, 52, 90], '10s', id='equidistant points'),
+        pytest.param([42], '15s', id='single point'),
+        pytest.param([0, 3, 9, 20, 41, 44, 60, 75, 101], '7s', id='frequency not dividing a day'),
+        pytest.param([0, 30, 400, 800, 1500], '7min', id='minutes not dividing a day'),
+    ]
+)
+def test_resample_nearest(offsets, freq):
+    index = pd.DatetimeIndex(pd.Timestamp('2020-06-01T12:00:02Z') + pd.to_timedelta(offsets, unit='s'), name='ts')
+    df = pd.DataFrame({'lat': np.arange(len(offsets), dtype=np.float32), 'hr': np.arange(len(offsets))}, index=index)
+    actual = model.resample_nearest(df, freq)
+    expected = df.resample(freq).nearest(limit=1)
+    pd.testing.assert_frame_equal(actual, expected, check_index_type=False)
+
+
+def test_normalize_timestamps():
+    index = pd.DatetimeIndex(['2020-01-15T17:30:05Z', '2020-06-15T16:30:05Z', '2020-06-16T04:00:00Z'], name='ts')
+    activities = pd.DataFrame({'track': [pd.DataFrame({'lat': [0.0, 0.0, 0.0]}, index=index)]})
+    actual = model.normalize_timestamps(activities, 'America/New_York')
+    assert list(actual['track'][0].index) == [12 * 3600 + 30 * 60 + 5, 12 * 3600 + 30 * 60 + 5, 0]
+
+
+def test_normalize_timestamps_multiple_activities():
+    tracks = [
+        pd.DataFrame({'lat': [0.0, 0.0]}, index=pd.DatetimeIndex(['2020-01-15T17:30:05Z', '2020-01-15T17:30:20Z'])),
+        pd.DataFrame({'lat': [0.0]}, index=pd.DatetimeIndex(['2020-06-15T04:00:00Z'])),
+        pd.DataFrame({'lat': [0.0, 0.0]}, index=pd.DatetimeIndex(['2020-06-16T03:59:59Z', '2020-06-16T04:00:00Z'])),
+    ]
+    actual = model.normalize_timestamps(pd.DataFrame({'track': tracks}), 'America/New_York')
+    assert [list(track.index) for track in actual['track']] == [[45005, 45020], [0], [86399, 0]]
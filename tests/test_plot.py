@@ -0,0 +1,85 @@
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import pytest
+
+import stravaplot.plot as plot
+
+
+def test_calc_bounds():
+    tracks = [
+        pd.DataFrame({'lat': [40.0, np.nan, 41.0], 'lon': [-74.0, np.nan, -73.5]}),
+        pd.DataFrame({'lat': [39.5, 40.5], 'lon': [-73.0, -72.0]}),
+    ]
+    xlim, ylim = plot.calc_bounds(tracks, lat_pad=0.5, lon_pad=0.25)
+    assert xlim == pytest.approx((-74.25, -71.75))
+    assert ylim == pytest.approx((39.0, 41.5))
+
+
+def test_calc_bounds_skips_empty_tracks():
+    tracks = [
+        pd.DataFrame({'lat': [], 'lon': []}),
+        pd.DataFrame({'lat': [40.0, 41.0], 'lon': [-74.0, -73.0]}),
+    ]
+    xlim, ylim = plot.calc_bounds(tracks, lat_pad=0, lon_pad=0)
+    assert xlim == pytest.approx((-74.0, -73.0))
+    assert ylim == pytest.approx((40.0, 41.0))
+
+
+def test_draw_track():
+    track = pd.DataFrame({'lat': [40.0, 40.5, 41.0], 'lon': [-74.0, -73.5, -73.0]})
+    fig, ax = plt.subplots()
+    plot.draw_track(track, ax)
+    path = ax.patches[0].get_path()
+    np.testing.assert_array_equal(path.vertices, [[-74.0, 40.0], [-73.5, 40.5], [-73.0, 41.0]])
+    plt.close(fig)
+
+
+def test_draw_composite():
+    tracks = [
+        pd.DataFrame({'lat': [40.0, 40.5], 'lon': [-74.0, -73.5]}),
+        pd.DataFrame({'lat': [41.0, 41.5, 42.0], 'lon': [-73.0, -72.5, -72.0]}),
+    ]
+    fig, ax = plt.subplots()
+    plot.draw_composite(tracks, ax, edgecolor='red')
+    collection, = ax.collections
+    assert [len(segment) for segment in collection.get_segments()] == [2, 3]
+    np.testing.assert_array_equal(collection.get_edgecolor(), [[1.0, 0.0, 0.0, 0.7]])
+    plt.close(fig)
+
+
+@pytest.mark.parametrize(
+    'points,tolerance,expected',
+    [
+        pytest.param([[0, 0], [1, 0.05], [2, -0.05], [3, 0]], 0.1, [[0, 0], [3, 0]], id='within tolerance'),
+        pytest.param([[0, 0], [1, 1], [2, 0]], 0.5, [[0, 0], [1, 1], [2, 0]], id='corner kept'),
+        pytest.param(
+            [[0, 0], [1, 0.2], [2, 0], [3, 0], [4, 0]],
+            0.1,
+            [[0, 0], [1, 0.2], [2, 0], [4, 0]],
+            id='recursive',
+        ),
+        pytest.param([[0, 0], [1, 0]], 0.1, [[0, 0], [1, 0]], id='two points'),
+    ]
+)
+def test_rdp(points, tolerance, expected):
+    actual = plot.rdp(np.array(points, dtype=float), tolerance)
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_track_vertices_keeps_gaps():
+    track = pd.DataFrame({
+        'lon': [0.0, 1.0, 2.0, np.nan, np.nan, 5.0, 6.0, 7.0],
+        'lat': [0.0, 0.0, 0.0, np.nan, np.nan, 1.0, 1.0, 1.0],
+    })
+    actual = plot.track_vertices(track, simplify_tol=0.1)
+    np.testing.assert_array_equal(actual, [[0.0, 0.0], [2.0, 0.0], [np.nan, np.nan], [5.0, 1.0], [7.0, 1.0]])
+
+
+def test_track_vertices_gap_with_known_lon():
+    track = pd.DataFrame({
+        'lon': [0.0, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0],
+        'lat': [0.0, 0.0, 0.0, np.nan, np.nan, 1.0, 1.0, 1.0],
+    })
+    actual = plot.track_vertices(track, simplify_tol=0.1)
+    np.testing.assert_array_equal(actual, [[0.0, 0.0], [2.0, 0.0], [3.0, np.nan], [5.0, 1.0], [7.0, 1.0]])
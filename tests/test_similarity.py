@@ -1,3 +1,5 @@
+import mmh3
+import numpy as np
 import pandas as pd
 import pytest
 
@@ -16,13 +18,30 @@ def test_window(source, size, expected):
     assert list(actual) == expected
 
 
+@pytest.mark.parametrize(
+    'source,size,expected',
+    [
+        pytest.param([1, 2, 3, 4, 5], 3, [[1, 2, 3], [2, 3, 4], [3, 4, 5]], id='non-empty input'),
+        pytest.param([1, 2], 3, np.empty((0, 3)), id='shorter than window'),
+        pytest.param([], 2, np.empty((0, 2)), id='empty input')
+    ]
+)
+def test_window_array(source, size, expected):
+    actual = similarity.window_array(np.array(source, dtype=np.int64), size)
+    np.testing.assert_array_equal(actual, expected)
+
+
 @pytest.mark.parametrize(
     'a,b,expected',
     [
         ('abdef', 'abc', 2),
         ('abc', 'abc', 3),
         ('abc', 'xyz', 0),
-        ('abc', '', 0)
+        ('abc', '', 0),
+        ('dr5ru7c4zz12', 'dr5rzzzzzzzz', 4),
+        ('héllo', 'hélp', 3),
+        (b'dr5ru7c4zz12', b'dr5rzzzzzzzz', 4),
+        (b'dr5ru', b'dr5ru', 5),
     ]
 )
 def test_common_prefix_len(a, b, expected):
@@ -30,13 +49,85 @@ def test_common_prefix_len(a, b, expected):
     assert actual == expected
 
 
+@pytest.mark.parametrize(
+    'codes',
+    [
+        pytest.param([b'dr5ru', b'dr5rz', b'dr72h', b'9q8yy'], id='same length'),
+        pytest.param([b'ab', b'ab', b'abc', b'', b'b'], id='different lengths'),
+    ]
+)
+def test_common_prefix_len_matrix(codes):
+    codes = np.array(codes)
+    actual = similarity.common_prefix_len_matrix(codes)
+    expected = [[similarity.common_prefix_len(a, b) for b in codes.tolist()] for a in codes.tolist()]
+    np.testing.assert_array_equal(actual, expected)
+
+
 @pytest.mark.parametrize(
     'raw,size,expected',
     [
-        (pd.Series(['a', 'b', 'c', 'd']), 2, {'a b', 'b c', 'c d'}),
-        (pd.Series(['a', 'b', 'b', 'a', 'b', 'c', 'd']), 3, {'a b a', 'b a b', 'a b c', 'b c d'})
+        (pd.Series(['a', 'b', 'c', 'd']), 2, {b'ab', b'bc', b'cd'}),
+        (pd.Series(['a', 'b', 'b', 'a', 'b', 'c', 'd']), 3, {b'aba', b'bab', b'abc', b'bcd'}),
+        (pd.Series(['dr5r', 'dr5r', 'dr5x', 'dr72']), 2, {b'dr5rdr5x', b'dr5xdr72'}),
+        (pd.Series(['dr5r', 'dr5x']), 3, set()),
+        (pd.Series([], dtype=object), 2, set()),
     ]
 )
 def test_make_shingles(raw, size, expected):
     actual = similarity.make_shingles(raw, size)
     assert actual == expected
+
+
+@pytest.mark.parametrize(
+    'lat,lon,precision,expected',
+    [
+        (42.6, -5.6, 5, 'ezs42'),
+        (57.64911, 10.40744, 11, 'u4pruydqqvj'),
+        (-25.382708, -49.265506, 12, '6gkzwgjzn820'),
+        # Points on cell boundaries belong to the lower cell
+        (0.0, 0.0, 5, '7zzzz'),
+        (45.0, 90.0, 5, 'tzzzz'),
+        (90.0, 180.0, 5, 'zzzzz'),
+        (-90.0, -180.0, 5, '00000'),
+    ]
+)
+def test_geohash_track(lat, lon, precision, expected):
+    track = pd.DataFrame({'lat': [lat, lat], 'lon': [lon, lon]}, index=['a', 'b'])
+    actual = similarity.geohash_track(track, precision)
+    pd.testing.assert_series_equal(actual, pd.Series([expected, expected], index=['a', 'b']))
+
+
+def test_geohash_codes():
+    track = pd.DataFrame({'lat': [42.6, 57.64911], 'lon': [-5.6, 10.40744]})
+    actual = similarity.geohash_codes(track, 5)
+    assert actual.dtype == np.dtype('S5')
+    np.testing.assert_array_equal(actual, [b'ezs42', b'u4pru'])
+
+
+def test_b1_minhash_sig():
+    a = {'a b c', 'b c d', 'c d e', 'd e f'}
+    actual = similarity.b1_minhash_sig(a, components=64)
+    assert actual.dtype == np.uint8
+    assert actual.shape == (64,)
+    assert set(actual) <= {0, 1}
+    np.testing.assert_array_equal(actual, similarity.b1_minhash_sig(set(sorted(a, reverse=True)), components=64))
+
+
+def test_b1_minhash_sig_estimates_jaccard():
+    a = {f'shingle {i}' for i in range(0, 300)}
+    b = {f'shingle {i}' for i in range(100, 400)}
+    sig_a = similarity.b1_minhash_sig(a, components=4096)
+    sig_b = similarity.b1_minhash_sig(b, components=4096)
+    # Matching 1-bit components estimate J + (1 - J) / 2; here J = 0.5
+    assert 2 * (sig_a == sig_b).mean() - 1 == pytest.approx(0.5, abs=0.05)
+
+
+def test_b1_minhash_sig_matches_exact_universal_hash():
+    shingles = {f'shingle {i}'.encode() for i in range(200)}
+    hashes = [mmh3.hash(shingle, 0, False) for shingle in shingles]
+    rng = np.random.RandomState(0)
+    a = rng.randint(1, 1 << 32, size=32, dtype=np.uint64).tolist()
+    b = rng.randint(0, 1 << 32, size=32, dtype=np.uint64).tolist()
+    # Python integers never overflow, so this is (a * h + b) mod p exactly
+    expected = [min((a_i * h + b_i) % similarity.HASH_PRIME for h in hashes) & 1 for a_i, b_i in zip(a, b)]
+    np.testing.assert_array_equal(similarity.b1_minhash_sig(shingles, components=32), expected)